@@ -17,12 +17,16 @@ Date: October 2025
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
-import uuid
-import random
-import random
+from datetime import datetime
+from functools import lru_cache, partial
+from operator import itemgetter
+import csv
+import gzip
+import io
+from types import MappingProxyType
+import secrets
+# plotly is imported inside the (cached) chart builders, so sessions that never
+# open the visualization section don't pay its import cost at startup
 
 # Page configuration
 st.set_page_config(
@@ -32,6 +36,83 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Plotly config for small summary charts that don't need zoom/pan/export tools
+_COMPACT_CHART_CONFIG = {'displayModeBar': False, 'staticPlot': False, 'responsive': True}
+
+# DHLI item keys in questionnaire order
+_DHLI_KEYS = tuple(f'DHLI_Q{i}' for i in range(1, 11))
+_get_dhli_scores = itemgetter(*_DHLI_KEYS)
+_DHLI_RADIO_KEYS = tuple(f"radio_{q_key}" for q_key in _DHLI_KEYS)
+
+# DHLI literacy level indexed by total score (0-10): 0-3 Low, 4-6 Moderate, 7-10 High
+_DHLI_LEVELS = ("Low",) * 4 + ("Moderate",) * 3 + ("High",) * 4
+_DHLI_LEVEL_ICONS = {"High": "🟢", "Moderate": "🟡", "Low": "🔴"}
+
+# Fields that must be filled in before data can be exported
+_ESSENTIAL_FIELDS = ('Participant_ID', 'Age', 'Gender', 'TB_Type')
+_get_essential_fields = itemgetter(*_ESSENTIAL_FIELDS)
+
+# Selectbox options ('' = not answered) with value -> index lookups for restoring selections
+_GENDER_OPTIONS = ('', 'Male', 'Female', 'Other')
+_GENDER_IDX = {option: i for i, option in enumerate(_GENDER_OPTIONS)}
+
+_TB_TYPE_OPTIONS = ('', 'Pulmonary', 'Extra pulmonary', 'DR-TB', 'Other')
+_TB_TYPE_IDX = {option: i for i, option in enumerate(_TB_TYPE_OPTIONS)}
+
+_OCCUPATION_OPTIONS = ('', 'Unemployed', 'Salaried', 'Self employed', 'Daily wage/Casual', 'Other')
+_OCCUPATION_IDX = {option: i for i, option in enumerate(_OCCUPATION_OPTIONS)}
+
+_EDUCATION_OPTIONS = ('', 'Illiterate', 'Primary', 'Secondary', 'Senior secondary', 'Graduate and above')
+_EDUCATION_IDX = {option: i for i, option in enumerate(_EDUCATION_OPTIONS)}
+
+_RESIDENCE_TYPE_OPTIONS = ('', 'Urban', 'Rural', 'Semi-Urban', 'Slum')
+_RESIDENCE_TYPE_IDX = {option: i for i, option in enumerate(_RESIDENCE_TYPE_OPTIONS)}
+
+_MONTHLY_INCOME_OPTIONS = ('', '< ₹5,942', '₹5,942 - ₹17,815', '₹17,816 - ₹29,722', '₹29,723 - ₹44,569', '₹44,570 - ₹59,416', '₹59,417 - ₹1,18,863', '≥ ₹1,18,864')
+_MONTHLY_INCOME_IDX = {option: i for i, option in enumerate(_MONTHLY_INCOME_OPTIONS)}
+
+_PATIENT_DELAY_REASON_OPTIONS = (
+    '',
+    'Did not recognize symptoms as serious',
+    'Financial constraints',
+    'Lack of awareness about TB',
+    'Fear of stigma related to TB',
+    'Unavailability of healthcare services',
+    'Transportation issues',
+    'Work/family commitments',
+    'Self-medication attempts',
+    'Other'
+)
+_PATIENT_DELAY_REASON_IDX = {option: i for i, option in enumerate(_PATIENT_DELAY_REASON_OPTIONS)}
+
+_PROVIDER_DELAY_REASON_OPTIONS = (
+    '',
+    'Delay in diagnostic tests',
+    'Waiting for test results',
+    'Misdiagnosis/incorrect initial diagnosis',
+    'Unavailability of healthcare provider',
+    'Inadequate clinical assessment',
+    'Referral delays between facilities',
+    'Equipment/facility unavailability',
+    'Administrative delays',
+    'Other'
+)
+_PROVIDER_DELAY_REASON_IDX = {option: i for i, option in enumerate(_PROVIDER_DELAY_REASON_OPTIONS)}
+
+_TREATMENT_DELAY_REASON_OPTIONS = (
+    '',
+    'Delay in availability of medicines',
+    'Waiting for additional test results',
+    'Financial reasons',
+    'Patient counseling and preparation',
+    'Administrative/paperwork delays',
+    'Referral to specialized center',
+    'Patient readiness/consent issues',
+    'Lack of awareness of treatment urgency',
+    'Other'
+)
+_TREATMENT_DELAY_REASON_IDX = {option: i for i, option in enumerate(_TREATMENT_DELAY_REASON_OPTIONS)}
+
 # Initialize session state
 def initialize_session_state():
     """Initialize all session state variables for data collection."""
@@ -126,18 +207,24 @@ def calculate_delays():
     treatment_date = data['Date_Treatment_Start']
     
     # Calculate delays if all dates are available
-    if all([symptom_date, first_visit_date, diagnosis_date, treatment_date]):
+    if symptom_date and first_visit_date and diagnosis_date and treatment_date:
+        # Work in day ordinals so each delay is a plain integer subtraction
+        symptom_day = symptom_date.toordinal()
+        first_visit_day = first_visit_date.toordinal()
+        diagnosis_day = diagnosis_date.toordinal()
+        treatment_day = treatment_date.toordinal()
+        
         # Patient delay: Symptom onset to first healthcare visit
-        data['Patient_Delay'] = (first_visit_date - symptom_date).days
+        data['Patient_Delay'] = first_visit_day - symptom_day
         
         # Healthcare Provider-related delay: First visit to diagnosis confirmation
-        data['Healthcare_Provider_Related_Delay'] = (diagnosis_date - first_visit_date).days
+        data['Healthcare_Provider_Related_Delay'] = diagnosis_day - first_visit_day
         
         # Treatment delay: Diagnosis to treatment start
-        data['Treatment_Delay'] = (treatment_date - diagnosis_date).days
+        data['Treatment_Delay'] = treatment_day - diagnosis_day
         
         # Total delay: Symptom onset to treatment start
-        data['Total_Delay'] = (treatment_date - symptom_date).days
+        data['Total_Delay'] = treatment_day - symptom_day
         
         # Set other delay types
         data['TB_Unit_TU'] = data['Healthcare_Provider_Related_Delay']  # TB Unit delay
@@ -147,165 +234,167 @@ def calculate_delays():
         return True
     return False
 
+def dhli_level(score):
+    """Classify a DHLI total score (0-10) as Low, Moderate or High literacy."""
+    return _DHLI_LEVELS[score]
+
+# Consecutive date pairs that must be in chronological order
+_DATE_SEQUENCE = (
+    ('Date_Symptom_Onset', 'Date_First_Visit', "Symptom Onset", "First Visit"),
+    ('Date_First_Visit', 'Date_Diagnosis', "First Visit", "Diagnosis"),
+    ('Date_Diagnosis', 'Date_Treatment_Start', "Diagnosis", "Treatment Start")
+)
+
 def validate_dates():
     """Validate that dates are in logical sequence."""
     data = st.session_state.participant_data
-    dates = [
-        data['Date_Symptom_Onset'],
-        data['Date_First_Visit'],
-        data['Date_Diagnosis'],
-        data['Date_Treatment_Start']
-    ]
-    
-    date_names = [
-        "Symptom Onset",
-        "First Visit", 
-        "Diagnosis",
-        "Treatment Start"
-    ]
     
     # Check if dates are in chronological order
-    for i in range(len(dates) - 1):
-        if dates[i] and dates[i + 1] and dates[i] > dates[i + 1]:
-            return False, f"Date sequence error: {date_names[i]} cannot be after {date_names[i + 1]}"
+    for earlier_key, later_key, earlier_name, later_name in _DATE_SEQUENCE:
+        earlier, later = data[earlier_key], data[later_key]
+        if earlier and later and earlier > later:
+            return False, f"Date sequence error: {earlier_name} cannot be after {later_name}"
     
     return True, "Dates are valid"
 
-def generate_sample_data():
-    """Generate fabricated sample data for 30 patients for demo purposes."""
-    random.seed(42)  # For reproducible results
-    np.random.seed(42)
-    
-    sample_data = []
-    
-    # Demographics data pools
-    names = [f"Patient_{i+1:03d}" for i in range(30)]
-    genders = ['Male', 'Female']
-    education_levels = ['No formal education', 'Primary school', 'Secondary school', 'Higher secondary', 'Graduate', 'Postgraduate']
-    occupations = ['Unemployed', 'Manual laborer', 'Skilled worker', 'Clerical', 'Professional', 'Business', 'Student', 'Homemaker']
-    income_levels = ['< ₹5,942', '₹5,942 - ₹17,815', '₹17,816 - ₹29,722', '₹29,723 - ₹44,569', '₹44,570 - ₹59,416', '₹59,417 - ₹1,18,863', '≥ ₹1,18,864']
-    locations = ['Urban', 'Semi-urban', 'Rural']
-    tb_types = ['Pulmonary TB', 'Extra-pulmonary TB']
-    
-    # Delay reasons
-    patient_delay_reasons = [
-        'Financial constraints', 'Lack of awareness about symptoms', 
-        'Self-medication attempts', 'Fear of stigma', 'Distance to healthcare facility',
-        'Work commitments', 'Family responsibilities'
-    ]
-    
-    provider_delay_reasons = [
-        'Misdiagnosis as other condition', 'Inadequate diagnostic facilities',
-        'Delayed test results', 'Multiple consultations required',
-        'Referral delays', 'Staff shortage', 'Equipment breakdown'
-    ]
-    
-    treatment_delay_reasons = [
-        'Drug availability issues', 'Patient counseling delays',
-        'Administrative procedures', 'Bed availability',
-        'Comorbidity management', 'Contact tracing', 'Insurance processing'
-    ]
-    
-    for i in range(30):
-        # Generate base date (symptom onset) - random date in last 6 months
-        base_date = datetime(2024, 4, 1) + timedelta(days=random.randint(0, 180))
-        
-        # Generate delays (in days)
-        patient_delay = random.randint(1, 90)
-        provider_delay = random.randint(1, 60) 
-        treatment_delay = random.randint(1, 30)
-        
-        # Calculate dates based on delays
-        first_visit_date = base_date + timedelta(days=patient_delay)
-        diagnosis_date = first_visit_date + timedelta(days=provider_delay)
-        treatment_date = diagnosis_date + timedelta(days=treatment_delay)
+# Sample data pools (fabricated demo patients; not the same as the form options)
+_SAMPLE_SIZE = 30
+_SAMPLE_SEED = 42
+_SAMPLE_GENDERS = ('Male', 'Female')
+_SAMPLE_EDUCATION_LEVELS = ('No formal education', 'Primary school', 'Secondary school', 'Higher secondary', 'Graduate', 'Postgraduate')
+_SAMPLE_OCCUPATIONS = ('Unemployed', 'Manual laborer', 'Skilled worker', 'Clerical', 'Professional', 'Business', 'Student', 'Homemaker')
+_SAMPLE_INCOME_LEVELS = ('< ₹5,942', '₹5,942 - ₹17,815', '₹17,816 - ₹29,722', '₹29,723 - ₹44,569', '₹44,570 - ₹59,416', '₹59,417 - ₹1,18,863', '≥ ₹1,18,864')
+_SAMPLE_MARITAL_STATUSES = ('Single', 'Married', 'Divorced', 'Widowed')
+_SAMPLE_LOCATIONS = ('Urban', 'Semi-urban', 'Rural')
+_SAMPLE_COMORBIDITIES = ('None', 'Diabetes', 'Hypertension', 'HIV', 'Other')
+_SAMPLE_TB_TYPES = ('Pulmonary TB', 'Extra-pulmonary TB')
+_SAMPLE_ADDICTIVE_SUBSTANCES = ('None', 'Tobacco', 'Alcohol', 'Other')
+
+# Sample delay reasons
+_SAMPLE_PATIENT_DELAY_REASONS = (
+    'Financial constraints', 'Lack of awareness about symptoms', 
+    'Self-medication attempts', 'Fear of stigma', 'Distance to healthcare facility',
+    'Work commitments', 'Family responsibilities'
+)
+
+_SAMPLE_PROVIDER_DELAY_REASONS = (
+    'Misdiagnosis as other condition', 'Inadequate diagnostic facilities',
+    'Delayed test results', 'Multiple consultations required',
+    'Referral delays', 'Staff shortage', 'Equipment breakdown'
+)
+
+_SAMPLE_TREATMENT_DELAY_REASONS = (
+    'Drug availability issues', 'Patient counseling delays',
+    'Administrative procedures', 'Bed availability',
+    'Comorbidity management', 'Contact tracing', 'Insurance processing'
+)
+
+# Low-cardinality sample columns stored as pandas categoricals (int codes, not strings)
+_SAMPLE_CATEGORICAL_COLUMNS = (
+    'Gender', 'Occupation', 'Education', 'Monthly_Income', 'Marital_Status',
+    'Residence_Type', 'Comorbidities', 'TB_Type', 'Addictive_Substances'
+)
+
+@st.cache_data(ttl=3600)  # Hourly, so the default collection date rolls over
+def generate_sample_data(collection_date=None, n_patients=_SAMPLE_SIZE, seed=_SAMPLE_SEED):
+    """Generate fabricated sample data (30 patients by default) for demo purposes."""
+    if collection_date is None:
+        collection_date = datetime.now().strftime('%Y-%m-%d')
+    rng = np.random.default_rng(seed)  # For reproducible results
+    patient_numbers = range(1, n_patients + 1)
+    
+    # Each column is drawn in a single vectorized call (one value per patient)
+    # Generate base date (symptom onset) - random date in last 6 months
+    base_dates = np.datetime64('2024-04-01') + rng.integers(0, 181, n_patients).astype('timedelta64[D]')
+    
+    # Generate delays (in days)
+    patient_delays = rng.integers(1, 91, n_patients)
+    provider_delays = rng.integers(1, 61, n_patients)
+    treatment_delays = rng.integers(1, 31, n_patients)
+    total_delays = patient_delays + provider_delays + treatment_delays
+    
+    # Calculate dates based on delays
+    first_visit_dates = base_dates + patient_delays.astype('timedelta64[D]')
+    diagnosis_dates = first_visit_dates + provider_delays.astype('timedelta64[D]')
+    treatment_dates = diagnosis_dates + treatment_delays.astype('timedelta64[D]')
+    
+    # Format all four date columns to ISO strings in one pass
+    symptom_strs, first_visit_strs, diagnosis_strs, treatment_strs = np.stack(
+        (base_dates, first_visit_dates, diagnosis_dates, treatment_dates)
+    ).astype('U10')
+    
+    # DHLI responses: one row per patient, one 0/1 column per question
+    dhli_scores = rng.integers(0, 2, size=(n_patients, len(_DHLI_KEYS)))
+    
+    # Build columns to match export structure (scalars are broadcast to every row)
+    return pd.DataFrame({
+        # Core identifiers
+        'Participant_ID': [f'TB{i:03d}' for i in patient_numbers],
+        'Name_Initials': [f"Patient_{i:03d}" for i in patient_numbers],
+        'Data_Collection_Date': collection_date,
         
-        # Generate patient data to match export structure
-        patient = {
-            # Core identifiers
-            'Participant_ID': f'TB{i+1:03d}',
-            'Name_Initials': names[i],
-            'Data_Collection_Date': datetime.now().strftime('%Y-%m-%d'),
-            
-            # Demographics
-            'Age': random.randint(18, 80),
-            'Gender': random.choice(genders),
-            'Address': f"Address {i+1}, Chennai",
-            'Occupation': random.choice(occupations),
-            'Education': random.choice(education_levels),
-            'Monthly_Income': random.choice(income_levels),
-            'Marital_Status': random.choice(['Single', 'Married', 'Divorced', 'Widowed']),
-            'Residence_Type': random.choice(locations),
-            'Comorbidities': random.choice(['None', 'Diabetes', 'Hypertension', 'HIV', 'Other']),
-            'Comorbidities_Details': '',
-            'TB_Type': random.choice(tb_types),
-            'Addictive_Substances': random.choice(['None', 'Tobacco', 'Alcohol', 'Other']),
-            'Addictive_Substances_Details': '',
-            
-            # Critical dates
-            'Date_Symptom_Onset': base_date.strftime('%Y-%m-%d'),
-            'Date_First_Visit': first_visit_date.strftime('%Y-%m-%d'),
-            'Date_Diagnosis': diagnosis_date.strftime('%Y-%m-%d'),
-            'Date_Treatment_Start': treatment_date.strftime('%Y-%m-%d'),
-            
-            # Calculated delays
-            'Patient_Delay': patient_delay,
-            'Healthcare_Provider_Related_Delay': provider_delay,
-            'Treatment_Delay': treatment_delay,
-            'Total_Delay': patient_delay + provider_delay + treatment_delay,
-            'TB_Unit_TU': provider_delay,
-            'Healthcare_Providers': provider_delay,
-            'No_Delay': (patient_delay + provider_delay + treatment_delay == 0),
-            
-            # Specific delay reasons
-            'Patient_Delay_Specific_Reason': random.choice(patient_delay_reasons),
-            'Provider_Delay_Specific_Reason': random.choice(provider_delay_reasons),
-            'Treatment_Delay_Specific_Reason': random.choice(treatment_delay_reasons),
-            
-            # Questionnaire responses (empty for sample data)
-            'Symptoms_Nature': '',
-            'First_Care_Location': '',
-            'Patient_Delay_Reason': '',
-            'Healthcare_Visits_Count': random.randint(1, 5),
-            'Diagnostic_Tests': '',
-            'Treatment_Delay_Experienced': '',
-            'Treatment_Delay_Reason': '',
-            'Provider_Awareness': '',
-            'Provider_Explanation': '',
-            'Provider_Difficulties': '',
-            'Provider_Difficulties_Details': '',
-            'Treatment_Satisfaction': '',
-            'TB_Stigma': '',
-            'Family_History': '',
-            'Family_History_Year': '',
-            'Additional_Support_Needed': '',
-            
-            # DHLI Assessment (Digital Health Literacy)
-            'DHLI_Q1': random.randint(0, 1),
-            'DHLI_Q2': random.randint(0, 1),
-            'DHLI_Q3': random.randint(0, 1),
-            'DHLI_Q4': random.randint(0, 1),
-            'DHLI_Q5': random.randint(0, 1),
-            'DHLI_Q6': random.randint(0, 1),
-            'DHLI_Q7': random.randint(0, 1),
-            'DHLI_Q8': random.randint(0, 1),
-            'DHLI_Q9': random.randint(0, 1),
-            'DHLI_Q10': random.randint(0, 1),
-            'DHLI_Total_Score': 0,  # Will be calculated
-            
-            # Verification
-            'Data_Verified': random.choice([True, False]),
-            'Verification_Notes': f'Sample patient {i+1} - fabricated data for demo'
-        }
+        # Demographics
+        'Age': rng.integers(18, 81, n_patients),
+        'Gender': rng.choice(_SAMPLE_GENDERS, n_patients),
+        'Address': [f"Address {i}, Chennai" for i in patient_numbers],
+        'Occupation': rng.choice(_SAMPLE_OCCUPATIONS, n_patients),
+        'Education': rng.choice(_SAMPLE_EDUCATION_LEVELS, n_patients),
+        'Monthly_Income': rng.choice(_SAMPLE_INCOME_LEVELS, n_patients),
+        'Marital_Status': rng.choice(_SAMPLE_MARITAL_STATUSES, n_patients),
+        'Residence_Type': rng.choice(_SAMPLE_LOCATIONS, n_patients),
+        'Comorbidities': rng.choice(_SAMPLE_COMORBIDITIES, n_patients),
+        'Comorbidities_Details': '',
+        'TB_Type': rng.choice(_SAMPLE_TB_TYPES, n_patients),
+        'Addictive_Substances': rng.choice(_SAMPLE_ADDICTIVE_SUBSTANCES, n_patients),
+        'Addictive_Substances_Details': '',
         
-        # Calculate DHLI total score
-        patient['DHLI_Total_Score'] = sum([patient[f'DHLI_Q{j}'] for j in range(1, 11)])
+        # Critical dates
+        'Date_Symptom_Onset': symptom_strs,
+        'Date_First_Visit': first_visit_strs,
+        'Date_Diagnosis': diagnosis_strs,
+        'Date_Treatment_Start': treatment_strs,
         
-
+        # Calculated delays
+        'Patient_Delay': patient_delays,
+        'Healthcare_Provider_Related_Delay': provider_delays,
+        'Treatment_Delay': treatment_delays,
+        'Total_Delay': total_delays,
+        'TB_Unit_TU': provider_delays,
+        'Healthcare_Providers': provider_delays,
+        'No_Delay': total_delays == 0,
+        
+        # Specific delay reasons
+        'Patient_Delay_Specific_Reason': rng.choice(_SAMPLE_PATIENT_DELAY_REASONS, n_patients),
+        'Provider_Delay_Specific_Reason': rng.choice(_SAMPLE_PROVIDER_DELAY_REASONS, n_patients),
+        'Treatment_Delay_Specific_Reason': rng.choice(_SAMPLE_TREATMENT_DELAY_REASONS, n_patients),
+        
+        # Questionnaire responses (empty for sample data)
+        'Symptoms_Nature': '',
+        'First_Care_Location': '',
+        'Patient_Delay_Reason': '',
+        'Healthcare_Visits_Count': rng.integers(1, 6, n_patients),
+        'Diagnostic_Tests': '',
+        'Treatment_Delay_Experienced': '',
+        'Treatment_Delay_Reason': '',
+        'Provider_Awareness': '',
+        'Provider_Explanation': '',
+        'Provider_Difficulties': '',
+        'Provider_Difficulties_Details': '',
+        'Treatment_Satisfaction': '',
+        'TB_Stigma': '',
+        'Family_History': '',
+        'Family_History_Year': '',
+        'Additional_Support_Needed': '',
+        
+        # DHLI Assessment (Digital Health Literacy) - every item counts towards the
+        # total, computed as one row-wise reduction over the response matrix
+        **{q_key: dhli_scores[:, i] for i, q_key in enumerate(_DHLI_KEYS)},
+        'DHLI_Total_Score': dhli_scores.sum(axis=1),
         
-        sample_data.append(patient)
-    
-    return pd.DataFrame(sample_data)
+        # Verification
+        'Data_Verified': rng.choice((True, False), n_patients),
+        'Verification_Notes': [f'Sample patient {i} - fabricated data for demo' for i in patient_numbers]
+    }).astype(dict.fromkeys(_SAMPLE_CATEGORICAL_COLUMNS, 'category'))
 
 def section_demographics():
     """Section 1: Demographics and Key Clinical Questions."""
@@ -318,7 +407,7 @@ def section_demographics():
         
         # Generate or input Participant ID
         if st.button("Generate New Participant ID"):
-            st.session_state.participant_data['Participant_ID'] = str(uuid.uuid4())[:8].upper()
+            st.session_state.participant_data['Participant_ID'] = secrets.token_hex(4).upper()
         
         st.session_state.participant_data['Participant_ID'] = st.text_input(
             "Participant ID", 
@@ -339,14 +428,14 @@ def section_demographics():
         
         st.session_state.participant_data['Gender'] = st.selectbox(
             "Gender",
-            options=['', 'Male', 'Female', 'Other'],
-            index=['', 'Male', 'Female', 'Other'].index(st.session_state.participant_data['Gender']) if st.session_state.participant_data['Gender'] else 0
+            options=_GENDER_OPTIONS,
+            index=_GENDER_IDX.get(st.session_state.participant_data['Gender'], 0)
         )
         
         st.session_state.participant_data['TB_Type'] = st.selectbox(
             "TB Type",
-            options=['', 'Pulmonary', 'Extra pulmonary', 'DR-TB', 'Other'],
-            index=['', 'Pulmonary', 'Extra pulmonary', 'DR-TB', 'Other'].index(st.session_state.participant_data['TB_Type']) if st.session_state.participant_data['TB_Type'] else 0
+            options=_TB_TYPE_OPTIONS,
+            index=_TB_TYPE_IDX.get(st.session_state.participant_data['TB_Type'], 0)
         )
     
     with col2:
@@ -354,26 +443,26 @@ def section_demographics():
         
         st.session_state.participant_data['Occupation'] = st.selectbox(
             "Occupation",
-            options=['', 'Unemployed', 'Salaried', 'Self employed', 'Daily wage/Casual', 'Other'],
-            index=['', 'Unemployed', 'Salaried', 'Self employed', 'Daily wage/Casual', 'Other'].index(st.session_state.participant_data['Occupation']) if st.session_state.participant_data['Occupation'] else 0
+            options=_OCCUPATION_OPTIONS,
+            index=_OCCUPATION_IDX.get(st.session_state.participant_data['Occupation'], 0)
         )
         
         st.session_state.participant_data['Education'] = st.selectbox(
             "Education Level",
-            options=['', 'Illiterate', 'Primary', 'Secondary', 'Senior secondary', 'Graduate and above'],
-            index=['', 'Illiterate', 'Primary', 'Secondary', 'Senior secondary', 'Graduate and above'].index(st.session_state.participant_data['Education']) if st.session_state.participant_data['Education'] else 0
+            options=_EDUCATION_OPTIONS,
+            index=_EDUCATION_IDX.get(st.session_state.participant_data['Education'], 0)
         )
         
         st.session_state.participant_data['Residence_Type'] = st.selectbox(
             "Type of Residence",
-            options=['', 'Urban', 'Rural', 'Semi-Urban', 'Slum'],
-            index=['', 'Urban', 'Rural', 'Semi-Urban', 'Slum'].index(st.session_state.participant_data['Residence_Type']) if st.session_state.participant_data['Residence_Type'] else 0
+            options=_RESIDENCE_TYPE_OPTIONS,
+            index=_RESIDENCE_TYPE_IDX.get(st.session_state.participant_data['Residence_Type'], 0)
         )
         
         st.session_state.participant_data['Monthly_Income'] = st.selectbox(
             "Monthly Household Income (INR)",
-            options=['', '< ₹5,942', '₹5,942 - ₹17,815', '₹17,816 - ₹29,722', '₹29,723 - ₹44,569', '₹44,570 - ₹59,416', '₹59,417 - ₹1,18,863', '≥ ₹1,18,864'],
-            index=['', '< ₹5,942', '₹5,942 - ₹17,815', '₹17,816 - ₹29,722', '₹29,723 - ₹44,569', '₹44,570 - ₹59,416', '₹59,417 - ₹1,18,863', '≥ ₹1,18,864'].index(st.session_state.participant_data['Monthly_Income']) if st.session_state.participant_data['Monthly_Income'] else 0
+            options=_MONTHLY_INCOME_OPTIONS,
+            index=_MONTHLY_INCOME_IDX.get(st.session_state.participant_data['Monthly_Income'], 0)
         )
     
 
@@ -382,6 +471,12 @@ def section_digital_pathway():
     """Section 2: Digital Pathway Mapping with Critical Events."""
     st.header("📅 Section 2: Digital Pathway Mapping")
     
+    # Dates, delay reasons and the delay summary rerun on their own as a fragment
+    pathway_timeline_fragment()
+
+@st.fragment
+def pathway_timeline_fragment():
+    """Critical dates, delay reasons and calculated delays (reruns without the rest of the app)."""
     st.subheader("Critical Timeline Events")
     st.write("Please enter the exact dates for each critical event in the patient's TB journey:")
     
@@ -427,23 +522,10 @@ def section_digital_pathway():
         st.write("**Patient Delay Reason**")
         st.write("*Gap: Symptom onset → First visit*")
         
-        patient_delay_options = [
-            '',
-            'Did not recognize symptoms as serious',
-            'Financial constraints',
-            'Lack of awareness about TB',
-            'Fear of stigma related to TB',
-            'Unavailability of healthcare services',
-            'Transportation issues',
-            'Work/family commitments',
-            'Self-medication attempts',
-            'Other'
-        ]
-        
         st.session_state.participant_data['Patient_Delay_Specific_Reason'] = st.selectbox(
             "Primary reason for patient delay:",
-            options=patient_delay_options,
-            index=patient_delay_options.index(st.session_state.participant_data['Patient_Delay_Specific_Reason']) if st.session_state.participant_data['Patient_Delay_Specific_Reason'] in patient_delay_options else 0,
+            options=_PATIENT_DELAY_REASON_OPTIONS,
+            index=_PATIENT_DELAY_REASON_IDX.get(st.session_state.participant_data['Patient_Delay_Specific_Reason'], 0),
             key="patient_delay_reason"
         )
     
@@ -451,23 +533,10 @@ def section_digital_pathway():
         st.write("**Provider Delay Reason**")
         st.write("*Gap: First visit → Diagnosis*")
         
-        provider_delay_options = [
-            '',
-            'Delay in diagnostic tests',
-            'Waiting for test results',
-            'Misdiagnosis/incorrect initial diagnosis',
-            'Unavailability of healthcare provider',
-            'Inadequate clinical assessment',
-            'Referral delays between facilities',
-            'Equipment/facility unavailability',
-            'Administrative delays',
-            'Other'
-        ]
-        
         st.session_state.participant_data['Provider_Delay_Specific_Reason'] = st.selectbox(
             "Primary reason for provider delay:",
-            options=provider_delay_options,
-            index=provider_delay_options.index(st.session_state.participant_data['Provider_Delay_Specific_Reason']) if st.session_state.participant_data['Provider_Delay_Specific_Reason'] in provider_delay_options else 0,
+            options=_PROVIDER_DELAY_REASON_OPTIONS,
+            index=_PROVIDER_DELAY_REASON_IDX.get(st.session_state.participant_data['Provider_Delay_Specific_Reason'], 0),
             key="provider_delay_reason"
         )
     
@@ -475,33 +544,20 @@ def section_digital_pathway():
         st.write("**Treatment Delay Reason**")
         st.write("*Gap: Diagnosis → Treatment start*")
         
-        treatment_delay_options = [
-            '',
-            'Delay in availability of medicines',
-            'Waiting for additional test results',
-            'Financial reasons',
-            'Patient counseling and preparation',
-            'Administrative/paperwork delays',
-            'Referral to specialized center',
-            'Patient readiness/consent issues',
-            'Lack of awareness of treatment urgency',
-            'Other'
-        ]
-        
         st.session_state.participant_data['Treatment_Delay_Specific_Reason'] = st.selectbox(
             "Primary reason for treatment delay:",
-            options=treatment_delay_options,
-            index=treatment_delay_options.index(st.session_state.participant_data['Treatment_Delay_Specific_Reason']) if st.session_state.participant_data['Treatment_Delay_Specific_Reason'] in treatment_delay_options else 0,
+            options=_TREATMENT_DELAY_REASON_OPTIONS,
+            index=_TREATMENT_DELAY_REASON_IDX.get(st.session_state.participant_data['Treatment_Delay_Specific_Reason'], 0),
             key="treatment_delay_reason"
         )
     
     st.subheader("Delay Calculation & Summary")
     
     # Automatically calculate delays when dates are available
-    if all([st.session_state.participant_data['Date_Symptom_Onset'], 
-            st.session_state.participant_data['Date_First_Visit'],
-            st.session_state.participant_data['Date_Diagnosis'], 
-            st.session_state.participant_data['Date_Treatment_Start']]):
+    if (st.session_state.participant_data['Date_Symptom_Onset'] and
+            st.session_state.participant_data['Date_First_Visit'] and
+            st.session_state.participant_data['Date_Diagnosis'] and
+            st.session_state.participant_data['Date_Treatment_Start']):
         
         # Validate dates first
         is_valid, message = validate_dates()
@@ -557,65 +613,52 @@ def section_digital_pathway():
                 ]
             }
             
-            import pandas as pd
             delay_df = pd.DataFrame(delay_summary_data)
             st.dataframe(delay_df, use_container_width=True, hide_index=True)
     
     else:
         st.info("⏳ Please enter all four dates above to automatically calculate delays and view summary.")
 
-def create_gantt_chart():
-    """Create a Gantt chart showing patient timelines."""
+# Gantt phases and their per-TB-type legend labels and colors
+_GANTT_PHASES = ("Pre-visit", "Diagnosis", "Pre-treatment")
+_GANTT_RESOURCE_LABELS = MappingProxyType({
+    tb_type: tuple(f"{tb_type}, {phase}" for phase in _GANTT_PHASES) for tb_type in _SAMPLE_TB_TYPES
+})
+_GANTT_COLOR_MAP = {
+    'Pulmonary TB, Pre-visit': '#1f77b4',
+    'Pulmonary TB, Diagnosis': '#aec7e8',
+    'Pulmonary TB, Pre-treatment': '#c5dbf7',
+    'Extra-pulmonary TB, Pre-visit': '#2ca02c',
+    'Extra-pulmonary TB, Diagnosis': '#98df8a',
+    'Extra-pulmonary TB, Pre-treatment': '#c4e6c0'
+}
+
+@st.cache_data
+def build_gantt_data():
+    """Build the Gantt chart phase rows (Task/Start/Finish/Resource) from sample data."""
     sample_df = generate_sample_data()
     
     # Prepare data for Gantt chart - only show first 8 patients for clarity
-    gantt_data = []
+    head = sample_df.head(8)
+    
+    # Parse all four date columns at once: one row per patient, one column per event
+    dates = head[['Date_Symptom_Onset', 'Date_First_Visit', 'Date_Diagnosis', 'Date_Treatment_Start']].to_numpy(dtype='datetime64[D]')
+    
+    # Reshape wide -> long: each patient gets three consecutive phase rows
+    # (pre-visit, diagnosis, pre-treatment) spanning adjacent event dates
+    return pd.DataFrame({
+        'Task': head['Participant_ID'].to_numpy().repeat(len(_GANTT_PHASES)),
+        'Start': dates[:, :-1].ravel(),
+        'Finish': dates[:, 1:].ravel(),
+        'Resource': [label for tb_type in head['TB_Type'] for label in _GANTT_RESOURCE_LABELS[tb_type]]
+    })
+
+@st.cache_resource
+def create_gantt_chart():
+    """Create a Gantt chart showing patient timelines."""
+    import plotly.express as px
     
-    for idx, row in sample_df.head(8).iterrows():
-        participant_id = row['Participant_ID']
-        tb_type = row['TB_Type']
-        
-        # Convert dates
-        symptom_date = pd.to_datetime(row['Date_Symptom_Onset'])
-        first_visit_date = pd.to_datetime(row['Date_First_Visit'])
-        diagnosis_date = pd.to_datetime(row['Date_Diagnosis'])
-        treatment_date = pd.to_datetime(row['Date_Treatment_Start'])
-        
-        # Pre-visit phase (symptoms to first visit)
-        gantt_data.append(dict(
-            Task=participant_id,
-            Start=symptom_date,
-            Finish=first_visit_date,
-            Resource=f"{tb_type}, Pre-visit"
-        ))
-        
-        # Diagnosis phase (first visit to diagnosis)
-        gantt_data.append(dict(
-            Task=participant_id,
-            Start=first_visit_date,
-            Finish=diagnosis_date,
-            Resource=f"{tb_type}, Diagnosis"
-        ))
-        
-        # Pre-treatment phase (diagnosis to treatment)
-        gantt_data.append(dict(
-            Task=participant_id,
-            Start=diagnosis_date,
-            Finish=treatment_date,
-            Resource=f"{tb_type}, Pre-treatment"
-        ))
-    
-    gantt_df = pd.DataFrame(gantt_data)
-    
-    # Create color mapping for different TB types and stages
-    color_map = {
-        'Pulmonary TB, Pre-visit': '#1f77b4',
-        'Pulmonary TB, Diagnosis': '#aec7e8',
-        'Pulmonary TB, Pre-treatment': '#c5dbf7',
-        'Extra-pulmonary TB, Pre-visit': '#2ca02c',
-        'Extra-pulmonary TB, Diagnosis': '#98df8a',
-        'Extra-pulmonary TB, Pre-treatment': '#c4e6c0'
-    }
+    gantt_df = build_gantt_data()
     
     # Create Gantt chart
     fig = px.timeline(
@@ -624,7 +667,7 @@ def create_gantt_chart():
         x_end="Finish",
         y="Task",
         color="Resource",
-        color_discrete_map=color_map,
+        color_discrete_map=_GANTT_COLOR_MAP,
         title="TB Patient Care Timelines"
     )
     
@@ -644,6 +687,141 @@ def create_gantt_chart():
     
     return fig
 
+@st.cache_resource(max_entries=32)  # Per-participant figures; bounded so they don't accumulate
+def create_delay_bar_chart(participant_id, patient_delay, provider_delay, treatment_delay):
+    """Create the current patient's delay bar chart, reused while the delays are unchanged."""
+    import plotly.graph_objects as go
+    
+    delays = {
+        'Patient Delay': patient_delay,
+        'Healthcare Provider-related Delay': provider_delay,
+        'Treatment Delay': treatment_delay
+    }
+    
+    # Create Plotly figure
+    fig = go.Figure()
+    
+    colors = ['#FF6B6B', '#4ECDC4', '#45B7D1']
+    
+    fig.add_trace(go.Bar(
+        x=list(delays.values()),
+        y=list(delays.keys()),
+        orientation='h',
+        marker_color=colors,
+        text=[f'{days} days' for days in delays.values()],
+        textposition='auto'
+    ))
+    
+    fig.update_layout(
+        title=f'TB Care Delays Timeline - Participant {participant_id}',
+        xaxis_title='Days',
+        yaxis_title='Delay Type',
+        showlegend=False,
+        height=300,
+        font=dict(size=12)
+    )
+    
+    return fig
+
+@st.cache_resource
+def create_histogram_chart(column, nbins, title, x_label, y_label='count'):
+    """Create a histogram of a sample data column from numpy-binned counts."""
+    import plotly.express as px
+    
+    counts, edges = np.histogram(generate_sample_data()[column].to_numpy(), bins=nbins)
+    
+    # Draw the bin counts as touching bars so only nbins values reach the browser
+    fig = px.bar(
+        x=0.5 * (edges[:-1] + edges[1:]),
+        y=counts,
+        title=title,
+        labels={'x': x_label, 'y': y_label}
+    )
+    fig.update_traces(width=np.diff(edges))
+    fig.update_layout(bargap=0)
+    
+    return fig
+
+@st.cache_resource
+def create_delay_box_chart():
+    """Create the box plot of total delay by TB type."""
+    import plotly.express as px
+    
+    return px.box(
+        generate_sample_data(),
+        x='TB_Type',
+        y='Total_Delay',
+        title='Delay Distribution by TB Type'
+    )
+
+@st.cache_resource
+def create_education_chart():
+    """Create the education distribution bar chart."""
+    import plotly.express as px
+    
+    education_counts = get_sample_stats()['education_counts']
+    return px.bar(
+        x=education_counts.index.astype(str),
+        y=education_counts.values,
+        title='Education Distribution',
+        labels={'x': 'Education', 'y': 'Count'}
+    )
+
+# Above this many patients the DHLI scatter plots binned counts instead of raw points
+_SCATTER_POINT_LIMIT = 2000
+
+@st.cache_resource
+def create_dhli_scatter_chart():
+    """Create the DHLI score vs total delay scatter plot."""
+    import plotly.express as px
+    
+    plot_df = generate_sample_data()
+    size = None
+    
+    # Large datasets: one marker per (delay bin, score, TB type), sized by patient count
+    if len(plot_df) > _SCATTER_POINT_LIMIT:
+        delay_bins, edges = pd.cut(plot_df['Total_Delay'], bins=30, labels=False, retbins=True)
+        plot_df = (
+            plot_df.assign(Total_Delay=(0.5 * (edges[:-1] + edges[1:]))[delay_bins])
+            .groupby(['Total_Delay', 'DHLI_Total_Score', 'TB_Type'], as_index=False, observed=True)
+            .size()
+            .rename(columns={'size': 'Patients'})
+        )
+        size = 'Patients'
+    
+    return px.scatter(
+        plot_df,
+        x='Total_Delay',
+        y='DHLI_Total_Score',
+        color='TB_Type',
+        size=size,
+        render_mode='webgl',
+        title='DHLI Score vs Total Delay',
+        labels={'Total_Delay': 'Total Delay (days)', 'DHLI_Total_Score': 'DHLI Score'}
+    )
+
+@st.cache_data
+def get_sample_stats():
+    """Compute the sample dataset's descriptive statistics and category counts once."""
+    sample_df = generate_sample_data()
+    delay_means = sample_df[['Total_Delay', 'Patient_Delay', 'Healthcare_Provider_Related_Delay', 'Treatment_Delay']].mean()
+    
+    gender_counts = sample_df['Gender'].value_counts(sort=False)
+    tb_type_counts = sample_df['TB_Type'].value_counts(sort=False)
+    
+    return {
+        'n': len(sample_df),
+        'mean_total': float(delay_means['Total_Delay']),
+        'median_total': float(sample_df['Total_Delay'].median()),
+        'mean_patient': float(delay_means['Patient_Delay']),
+        'mean_provider': float(delay_means['Healthcare_Provider_Related_Delay']),
+        'mean_treatment': float(delay_means['Treatment_Delay']),
+        'male_count': int(gender_counts.get('Male', 0)),
+        'female_count': int(gender_counts.get('Female', 0)),
+        'pulmonary_count': int(tb_type_counts.get('Pulmonary TB', 0)),
+        'education_counts': sample_df['Education'].value_counts()
+    }
+
 def section_visualization():
     """Section 4: Real-time Delay Visualization with Data Analytics."""
     st.header("📊 Section 4: Data Visualization & Analytics")
@@ -658,38 +836,14 @@ def section_visualization():
         # Check if delays have been calculated
         if data['Total_Delay'] > 0:
             # Create horizontal bar chart
-            delays = {
-                'Patient Delay': data['Patient_Delay'],
-                'Healthcare Provider-related Delay': data['Healthcare_Provider_Related_Delay'],
-                'Treatment Delay': data['Treatment_Delay']
-            }
-            
-            # Create Plotly figure
-            fig = go.Figure()
-            
-            colors = ['#FF6B6B', '#4ECDC4', '#45B7D1']
-            
-            for i, (delay_type, days) in enumerate(delays.items()):
-                fig.add_trace(go.Bar(
-                    x=[days],
-                    y=[delay_type],
-                    orientation='h',
-                    marker_color=colors[i],
-                    text=[f'{days} days'],
-                    textposition='auto',
-                    name=delay_type
-                ))
-            
-            fig.update_layout(
-                title=f'TB Care Delays Timeline - Participant {data["Participant_ID"]}',
-                xaxis_title='Days',
-                yaxis_title='Delay Type',
-                showlegend=False,
-                height=300,
-                font=dict(size=12)
+            fig = create_delay_bar_chart(
+                data['Participant_ID'],
+                data['Patient_Delay'],
+                data['Healthcare_Provider_Related_Delay'],
+                data['Treatment_Delay']
             )
             
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(fig, use_container_width=True, config=_COMPACT_CHART_CONFIG, key="delay_bar_chart")
             
             # Additional insights
             st.subheader("📈 Delay Analysis")
@@ -726,55 +880,41 @@ def section_visualization():
         st.write("Visual representation of TB patient care timelines across different phases")
         
         gantt_fig = create_gantt_chart()
-        st.plotly_chart(gantt_fig, use_container_width=True)
+        st.plotly_chart(gantt_fig, use_container_width=True, key="gantt_chart")
     
     with tab3:
         st.subheader("Data Analytics Dashboard")
-        sample_df = generate_sample_data()
         
         # Descriptive Statistics
         st.write("### Descriptive Statistics")
         
         col1, col2, col3 = st.columns(3)
         
+        stats = get_sample_stats()
+        
         with col1:
-            st.metric("Total Patients", len(sample_df))
-            st.metric("Mean Total Delay", f"{sample_df['Total_Delay'].mean():.1f} days")
-            st.metric("Median Total Delay", f"{sample_df['Total_Delay'].median():.1f} days")
+            st.metric("Total Patients", stats['n'])
+            st.metric("Mean Total Delay", f"{stats['mean_total']:.1f} days")
+            st.metric("Median Total Delay", f"{stats['median_total']:.1f} days")
         
         with col2:
-            st.metric("Mean Patient Delay", f"{sample_df['Patient_Delay'].mean():.1f} days")
-            st.metric("Mean Provider Delay", f"{sample_df['Healthcare_Provider_Related_Delay'].mean():.1f} days")
-            st.metric("Mean Treatment Delay", f"{sample_df['Treatment_Delay'].mean():.1f} days")
+            st.metric("Mean Patient Delay", f"{stats['mean_patient']:.1f} days")
+            st.metric("Mean Provider Delay", f"{stats['mean_provider']:.1f} days")
+            st.metric("Mean Treatment Delay", f"{stats['mean_treatment']:.1f} days")
         
         with col3:
-            male_count = len(sample_df[sample_df['Gender'] == 'Male'])
-            female_count = len(sample_df[sample_df['Gender'] == 'Female'])
-            st.metric("Male Patients", male_count)
-            st.metric("Female Patients", female_count)
-            pulm_tb = len(sample_df[sample_df['TB_Type'] == 'Pulmonary TB'])
-            st.metric("Pulmonary TB", pulm_tb)
+            st.metric("Male Patients", stats['male_count'])
+            st.metric("Female Patients", stats['female_count'])
+            st.metric("Pulmonary TB", stats['pulmonary_count'])
         
         # Delay Distribution
         st.write("### Delay Distribution Analysis")
         
-        fig_hist = px.histogram(
-            sample_df, 
-            x='Total_Delay', 
-            nbins=20,
-            title='Distribution of Total Delays',
-            labels={'Total_Delay': 'Total Delay (days)', 'count': 'Number of Patients'}
-        )
-        st.plotly_chart(fig_hist, use_container_width=True)
+        fig_hist = create_histogram_chart('Total_Delay', 20, 'Distribution of Total Delays', 'Total Delay (days)', 'Number of Patients')
+        st.plotly_chart(fig_hist, use_container_width=True, key="delay_histogram")
         
         # Box plot by TB Type
-        fig_box = px.box(
-            sample_df,
-            x='TB_Type',
-            y='Total_Delay',
-            title='Delay Distribution by TB Type'
-        )
-        st.plotly_chart(fig_box, use_container_width=True)
+        st.plotly_chart(create_delay_box_chart(), use_container_width=True, key="delay_box")
         
         # Demographics Analysis
         st.write("### Demographics Profile")
@@ -783,39 +923,103 @@ def section_visualization():
         
         with col1:
             # Age distribution
-            fig_age = px.histogram(
-                sample_df,
-                x='Age',
-                title='Age Distribution',
-                nbins=15
-            )
-            st.plotly_chart(fig_age, use_container_width=True)
+            fig_age = create_histogram_chart('Age', 15, 'Age Distribution', 'Age')
+            st.plotly_chart(fig_age, use_container_width=True, key="age_histogram")
         
         with col2:
             # Education distribution
-            education_counts = sample_df['Education'].value_counts()
-            fig_edu = px.pie(
-                values=education_counts.values,
-                names=education_counts.index,
-                title='Education Distribution'
-            )
-            st.plotly_chart(fig_edu, use_container_width=True)
+            st.plotly_chart(create_education_chart(), use_container_width=True, config=_COMPACT_CHART_CONFIG, key="education_bar")
         
         # DHLI Score Analysis
         st.write("### Digital Health Literacy Analysis")
         
-        fig_dhli = px.scatter(
-            sample_df,
-            x='Total_Delay',
-            y='DHLI_Total_Score',
-            color='TB_Type',
-            title='DHLI Score vs Total Delay',
-            labels={'Total_Delay': 'Total Delay (days)', 'DHLI_Total_Score': 'DHLI Score'}
-        )
-        st.plotly_chart(fig_dhli, use_container_width=True)
+        st.plotly_chart(create_dhli_scatter_chart(), use_container_width=True, key="dhli_scatter")
     
 
 
+# DHLI Questions (10-item simplified version for oral administration), read-only
+_DHLI_QUESTIONS = MappingProxyType({
+    'DHLI_Q1': {
+        'english': "Do you have access to a mobile phone for health info?",
+        'tamil': "உங்கள் மொபைல் போனில் சுகாதார தகவல்களைப் பெற முடியுமா?",
+        'options': ['No (இல்லை)', 'Yes (ஆம்)']
+    },
+    'DHLI_Q2': {
+        'english': "Can you use a phone to call for medical advice?",
+        'tamil': "மருத்துவ ஆலோசனைக்காக போன் செய்ய முடியுமா?",
+        'options': ['No (இல்லை)', 'Yes (ஆம்)']
+    },
+    'DHLI_Q3': {
+        'english': "Do you know how to send/receive SMS health messages?",
+        'tamil': "SMS சுகாதார செய்திகளை அனுப்ப/பெற முடியுமா?",
+        'options': ['Disagree (ஒப்புக்கொள்ளவில்லை)', 'Agree (ஒப்புக்கொள்கிறேன்)']
+    },
+    'DHLI_Q4': {
+        'english': "Can you find health info using voice calls or simple apps?",
+        'tamil': "குரல் அழைப்பு அல்லது எளிய ஆப் மூலம் சுகாதார தகவலைத் தேட முடியுமா?",
+        'options': ['No (இல்லை)', 'Yes (ஆம்)']
+    },
+    'DHLI_Q5': {
+        'english': "Do you check if phone/online health info is reliable?",
+        'tamil': "போன்/ஆன்லைன் சுகாதார தகவல் நம்பகமானதா என சரிபார்க்கிறீர்களா?",
+        'options': ['Disagree (ஒப்புக்கொள்ளவில்லை)', 'Agree (ஒப்புக்கொள்கிறேன்)']
+    },
+    'DHLI_Q6': {
+        'english': "Can you understand health videos/audio on phone?",
+        'tamil': "போனில் சுகாதார வீடியோ/ஆடியோவைப் புரிந்து கொள்ள முடியுமா?",
+        'options': ['No (இல்லை)', 'Yes (ஆம்)']
+    },
+    'DHLI_Q7': {
+        'english': "Do you use digital tools (e.g., SMS) to remember appointments?",
+        'tamil': "appointment-களை நினைவூட்ட எஸ்எம்எஸ் போன்ற டிஜிட்டல் கருவிகளைப் பயன்படுத்துகிறீர்களா?",
+        'options': ['No (இல்லை)', 'Yes (ஆம்)']
+    },
+    'DHLI_Q8': {
+        'english': "Can you share health info with family via phone?",
+        'tamil': "குடும்பத்துடன் சுகாதார தகவலை போன் மூலம் பகிர முடியுமா?",
+        'options': ['Disagree (ஒப்புக்கொள்ளவில்லை)', 'Agree (ஒப்புக்கொள்கிறேன்)']
+    },
+    'DHLI_Q9': {
+        'english': "Do you face problems using digital health services due to language/tech barriers?",
+        'tamil': "மொழி/டெக் காரணமாக டிஜிட்டல் சுகாதார சேவைகளில் சிக்கல்கள் உண்டா?",
+        'options': ['No (இல்லை)', 'Yes (ஆம்)'],
+        'reverse_score': True
+    },
+    'DHLI_Q10': {
+        'english': "Would you use phone-based TB reminders if available?",
+        'tamil': "கிடைக்குமானால் போன் அடிப்படையிலான டிபி நினைவூட்டிகளைப் பயன்படுத்துவீர்களா?",
+        'options': ['No (இல்லை)', 'Yes (ஆம்)']
+    }
+})
+
+# Radio option values shared by every question (0 = No, 1 = Yes)
+_DHLI_OPTION_VALUES = (0, 1)
+
+# Reverse-scored questions (stored score = 1 - selected option)
+_DHLI_REVERSE_KEYS = frozenset(q_key for q_key, question_data in _DHLI_QUESTIONS.items() if question_data.get('reverse_score', False))
+
+# (question number, key, question data) in questionnaire order, for rendering loops
+_DHLI_Q_ITEMS = tuple((q_num, q_key, _DHLI_QUESTIONS[q_key]) for q_num, q_key in enumerate(_DHLI_KEYS, 1))
+
+# Static columns of the individual question scores table
+_DHLI_TABLE_QUESTIONS = tuple(f'Q{q_num}' for q_num, _, _ in _DHLI_Q_ITEMS)
+_DHLI_TABLE_ENGLISH = tuple(question_data['english'][:50] + "..." for _, _, question_data in _DHLI_Q_ITEMS)
+
+
+def save_dhli_responses():
+    """Store submitted DHLI form responses and recalculate the total score."""
+    data = st.session_state.participant_data
+    
+    # Build the score vector in questionnaire order (handle reverse scoring for Q9)
+    scores = [
+        1 - st.session_state[radio_key] if q_key in _DHLI_REVERSE_KEYS else st.session_state[radio_key]
+        for q_key, radio_key in zip(_DHLI_KEYS, _DHLI_RADIO_KEYS)
+    ]
+    data.update(zip(_DHLI_KEYS, scores))
+    
+    # Calculate total DHLI score from the vector rather than re-reading the record
+    data['DHLI_Total_Score'] = sum(scores)
+
 def section_dhli():
     """Section 3: Digital Health Literacy Instrument (DHLI) Assessment."""
     st.header(" Section 3: Digital Health Literacy Assessment (DHLI)")
@@ -828,101 +1032,37 @@ def section_dhli():
     *இந்த மதிப்பீடு சுகாதார தகவல்களுக்கான டிஜிட்டல் கருவிகளைப் பயன்படுத்தும் உங்கள் திறனை மதிப்பிடுகிறது।*
     """)
     
-    # DHLI Questions (10-item simplified version for oral administration)
-    dhli_questions = {
-        'DHLI_Q1': {
-            'english': "Do you have access to a mobile phone for health info?",
-            'tamil': "உங்கள் மொபைல் போனில் சுகாதார தகவல்களைப் பெற முடியுமா?",
-            'options': ['No (இல்லை)', 'Yes (ஆம்)']
-        },
-        'DHLI_Q2': {
-            'english': "Can you use a phone to call for medical advice?",
-            'tamil': "மருத்துவ ஆலோசனைக்காக போன் செய்ய முடியுமா?",
-            'options': ['No (இல்லை)', 'Yes (ஆம்)']
-        },
-        'DHLI_Q3': {
-            'english': "Do you know how to send/receive SMS health messages?",
-            'tamil': "SMS சுகாதார செய்திகளை அனுப்ப/பெற முடியுமா?",
-            'options': ['Disagree (ஒப்புக்கொள்ளவில்லை)', 'Agree (ஒப்புக்கொள்கிறேன்)']
-        },
-        'DHLI_Q4': {
-            'english': "Can you find health info using voice calls or simple apps?",
-            'tamil': "குரல் அழைப்பு அல்லது எளிய ஆப் மூலம் சுகாதார தகவலைத் தேட முடியுமா?",
-            'options': ['No (இல்லை)', 'Yes (ஆம்)']
-        },
-        'DHLI_Q5': {
-            'english': "Do you check if phone/online health info is reliable?",
-            'tamil': "போன்/ஆன்லைன் சுகாதார தகவல் நம்பகமானதா என சரிபார்க்கிறீர்களா?",
-            'options': ['Disagree (ஒப்புக்கொள்ளவில்லை)', 'Agree (ஒப்புக்கொள்கிறேன்)']
-        },
-        'DHLI_Q6': {
-            'english': "Can you understand health videos/audio on phone?",
-            'tamil': "போனில் சுகாதார வீடியோ/ஆடியோவைப் புரிந்து கொள்ள முடியுமா?",
-            'options': ['No (இல்லை)', 'Yes (ஆம்)']
-        },
-        'DHLI_Q7': {
-            'english': "Do you use digital tools (e.g., SMS) to remember appointments?",
-            'tamil': "appointment-களை நினைவூட்ட எஸ்எம்எஸ் போன்ற டிஜிட்டல் கருவிகளைப் பயன்படுத்துகிறீர்களா?",
-            'options': ['No (இல்லை)', 'Yes (ஆம்)']
-        },
-        'DHLI_Q8': {
-            'english': "Can you share health info with family via phone?",
-            'tamil': "குடும்பத்துடன் சுகாதார தகவலை போன் மூலம் பகிர முடியுமா?",
-            'options': ['Disagree (ஒப்புக்கொள்ளவில்லை)', 'Agree (ஒப்புக்கொள்கிறேன்)']
-        },
-        'DHLI_Q9': {
-            'english': "Do you face problems using digital health services due to language/tech barriers?",
-            'tamil': "மொழி/டெக் காரணமாக டிஜிட்டல் சுகாதார சேவைகளில் சிக்கல்கள் உண்டா?",
-            'options': ['No (இல்லை)', 'Yes (ஆம்)'],
-            'reverse_score': True
-        },
-        'DHLI_Q10': {
-            'english': "Would you use phone-based TB reminders if available?",
-            'tamil': "கிடைக்குமானால் போன் அடிப்படையிலான டிபி நினைவூட்டிகளைப் பயன்படுத்துவீர்களா?",
-            'options': ['No (இல்லை)', 'Yes (ஆம்)']
-        }
-    }
-    
     st.subheader("📋 DHLI Questions (டிஜிட்டல் சுகாதார)")
     st.write("*Please select your response for each question. Score: Yes/Agree = 1, No/Disagree = 0*")
     
-    # Display questions
-    for q_num in range(1, 11):
-        q_key = f'DHLI_Q{q_num}'
-        question_data = dhli_questions[q_key]
-        
-        col1, col2 = st.columns([4, 1])
-        
-        with col1:
+    # Collect all responses in a form so answering a question doesn't rerun the app;
+    # scores are saved to session state by save_dhli_responses() on submit
+    with st.form("dhli_form"):
+        for (q_num, q_key, question_data), radio_key in zip(_DHLI_Q_ITEMS, _DHLI_RADIO_KEYS):
+            saved_score = st.session_state.participant_data[q_key]
+            
             st.write(f"**Q{q_num}.** {question_data['english']}")
             st.write(f"*{question_data['tamil']}*")
             
-            # Radio button for response
-            response = st.radio(
+            # Radio button for response, restored from the saved score; the submit
+            # callback reads the selection back from session state under its key
+            st.radio(
                 f"Response Q{q_num}",
-                options=[0, 1],
-                format_func=lambda x: question_data['options'][x],
-                index=st.session_state.participant_data[q_key],
-                key=f"radio_{q_key}",
+                options=_DHLI_OPTION_VALUES,
+                format_func=question_data['options'].__getitem__,
+                index=1 - saved_score if q_key in _DHLI_REVERSE_KEYS else saved_score,
+                key=radio_key,
                 label_visibility="collapsed"
             )
             
-            # Handle reverse scoring for Q9
-            if question_data.get('reverse_score', False):
-                st.session_state.participant_data[q_key] = 1 - response  # Reverse score
+            if q_key in _DHLI_REVERSE_KEYS:
                 st.caption("*Note: This question is reverse-scored (No = 1, Yes = 0)*")
-            else:
-                st.session_state.participant_data[q_key] = response
-        
-        with col2:
-            actual_score = st.session_state.participant_data[q_key]
-            st.metric(f"Q{q_num} Score", actual_score)
+            
+            st.divider()
         
-        st.divider()
+        st.form_submit_button("Save DHLI Responses", type="primary", on_click=save_dhli_responses)
     
-    # Calculate total DHLI score
-    total_score = sum([st.session_state.participant_data[f'DHLI_Q{i}'] for i in range(1, 11)])
-    st.session_state.participant_data['DHLI_Total_Score'] = total_score
+    total_score = st.session_state.participant_data['DHLI_Total_Score']
     
     st.subheader("📊 Digital Health Literacy Score Summary")
     
@@ -937,19 +1077,11 @@ def section_dhli():
     
     with col2:
         # DHLI interpretation based on score
-        if total_score >= 7:
-            level = "High"
-            color = "🟢"
-        elif total_score >= 4:
-            level = "Moderate" 
-            color = "🟡"
-        else:
-            level = "Low"
-            color = "🔴"
+        level = dhli_level(total_score)
         
         st.metric(
             "Digital Health Literacy Level",
-            f"{color} {level}",
+            f"{_DHLI_LEVEL_ICONS[level]} {level}",
             help=f"Based on DHLI score: {total_score}/10. ≤6 indicates low digital health literacy"
         )
     
@@ -977,21 +1109,26 @@ def section_dhli():
     - **Clinical relevance**: Low scores correlate with treatment delays and may require additional support for digital TB care interventions
     """)
     
-    # Display individual question breakdown
-    with st.expander("📈 View Individual Question Scores"):
-        score_data = []
-        for i in range(1, 11):
-            q_key = f'DHLI_Q{i}'
-            score_data.append({
-                'Question': f'Q{i}',
-                'English': dhli_questions[q_key]['english'][:50] + "...",
-                'Score': st.session_state.participant_data[q_key],
-                'Response': dhli_questions[q_key]['options'][st.session_state.participant_data[q_key]]
-            })
-        
-        import pandas as pd
-        df_scores = pd.DataFrame(score_data)
-        st.dataframe(df_scores, use_container_width=True)
+    # Display individual question breakdown (one table instead of a metric per question)
+    with st.expander("📈 View Individual Question Scores", expanded=True):
+        scores = _get_dhli_scores(st.session_state.participant_data)
+        
+        df_scores = pd.DataFrame({
+            'Question': _DHLI_TABLE_QUESTIONS,
+            'English': _DHLI_TABLE_ENGLISH,
+            'Score': scores,
+            'Response': [
+                question_data['options'][1 - score if q_key in _DHLI_REVERSE_KEYS else score]
+                for (_, q_key, question_data), score in zip(_DHLI_Q_ITEMS, scores)
+            ]
+        })
+        st.dataframe(df_scores, use_container_width=True, hide_index=True)
+
+def save_verification():
+    """Store submitted verification form inputs."""
+    data = st.session_state.participant_data
+    data['Data_Verified'] = st.session_state.verification_checkbox
+    data['Verification_Notes'] = st.session_state.verification_notes
 
 def section_verification():
     """Section 5: Data Verification and Export."""
@@ -1005,117 +1142,89 @@ def section_verification():
     col1, col2 = st.columns(2)
     
     with col1:
-        st.write("**Participant Information:**")
-        st.write(f"• ID: {data['Participant_ID']}")
-        st.write(f"• Age: {data['Age']}")
-        st.write(f"• Gender: {data['Gender']}")
-        st.write(f"• TB Type: {data['TB_Type']}")
-        
-        st.write("**Timeline:**")
+        lines = [
+            "**Participant Information:**",
+            f"• ID: {data['Participant_ID']}",
+            f"• Age: {data['Age']}",
+            f"• Gender: {data['Gender']}",
+            f"• TB Type: {data['TB_Type']}",
+            "**Timeline:**"
+        ]
         if data['Date_Symptom_Onset']:
-            st.write(f"• Symptom Onset: {data['Date_Symptom_Onset']}")
+            lines.append(f"• Symptom Onset: {data['Date_Symptom_Onset']}")
         if data['Date_First_Visit']:
-            st.write(f"• First Visit: {data['Date_First_Visit']}")
+            lines.append(f"• First Visit: {data['Date_First_Visit']}")
         if data['Date_Diagnosis']:
-            st.write(f"• Diagnosis: {data['Date_Diagnosis']}")
+            lines.append(f"• Diagnosis: {data['Date_Diagnosis']}")
         if data['Date_Treatment_Start']:
-            st.write(f"• Treatment Start: {data['Date_Treatment_Start']}")
+            lines.append(f"• Treatment Start: {data['Date_Treatment_Start']}")
+        
+        # Render the whole column as one markdown element
+        st.markdown("\n\n".join(lines))
     
     with col2:
-        st.write("**Calculated Delays:**")
-        st.write(f"• Patient Delay: {data['Patient_Delay']} days")
-        st.write(f"• Healthcare Provider-related Delay: {data['Healthcare_Provider_Related_Delay']} days")
-        st.write(f"• Treatment Delay: {data['Treatment_Delay']} days")
-        st.write(f"• Total Delay: {data['Total_Delay']} days")
-        st.write(f"• TB Unit (TU): {data['TB_Unit_TU']} days")
-        st.write(f"• Healthcare Providers: {data['Healthcare_Providers']} days")
-        st.write(f"• No Delay: {data['No_Delay']}")
-        
-        st.write("**DHLI Score:**")
-        st.write(f"• Total Score: {data['DHLI_Total_Score']}/10")
-        
-        # DHLI level
-        if data['DHLI_Total_Score'] >= 7:
-            level = "High"
-        elif data['DHLI_Total_Score'] >= 4:
-            level = "Moderate"
-        else:
-            level = "Low"
-        st.write(f"• Digital Health Literacy Level: {level}")
+        lines = [
+            "**Calculated Delays:**",
+            f"• Patient Delay: {data['Patient_Delay']} days",
+            f"• Healthcare Provider-related Delay: {data['Healthcare_Provider_Related_Delay']} days",
+            f"• Treatment Delay: {data['Treatment_Delay']} days",
+            f"• Total Delay: {data['Total_Delay']} days",
+            f"• TB Unit (TU): {data['TB_Unit_TU']} days",
+            f"• Healthcare Providers: {data['Healthcare_Providers']} days",
+            f"• No Delay: {data['No_Delay']}",
+            "**DHLI Score:**",
+            f"• Total Score: {data['DHLI_Total_Score']}/10",
+            f"• Digital Health Literacy Level: {dhli_level(data['DHLI_Total_Score'])}"
+        ]
+        st.markdown("\n\n".join(lines))
     
     st.subheader("🔍 Verification")
     
-    # Verification checkbox
-    st.session_state.participant_data['Data_Verified'] = st.checkbox(
-        "✅ Data Verified against Medical Records",
-        value=st.session_state.participant_data['Data_Verified'],
-        help="Check this box to confirm that all data has been verified against medical records"
-    )
-    
-    # Verification notes
-    st.session_state.participant_data['Verification_Notes'] = st.text_area(
-        "Verification Notes",
-        value=st.session_state.participant_data['Verification_Notes'],
-        placeholder="Enter any notes about data verification, discrepancies, or additional observations...",
-        height=100
-    )
+    # Collect verification inputs in a form so ticking the box or typing notes doesn't
+    # rerun the app; they are saved to session state by save_verification() on submit
+    with st.form("verification_form"):
+        # Verification checkbox
+        st.checkbox(
+            "✅ Data Verified against Medical Records",
+            value=st.session_state.participant_data['Data_Verified'],
+            help="Check this box to confirm that all data has been verified against medical records",
+            key="verification_checkbox"
+        )
+        
+        # Verification notes
+        st.text_area(
+            "Verification Notes",
+            value=st.session_state.participant_data['Verification_Notes'],
+            placeholder="Enter any notes about data verification, discrepancies, or additional observations...",
+            height=100,
+            key="verification_notes"
+        )
+        
+        st.form_submit_button("Save Verification", on_click=save_verification)
     
     st.subheader("💾 Data Export")
     
     # Check if essential data is complete
-    essential_fields = ['Participant_ID', 'Age', 'Gender', 'TB_Type']
-    missing_fields = [field for field in essential_fields if not data[field]]
+    essential_values = _get_essential_fields(data)
     
-    if missing_fields:
+    if not all(essential_values):
+        missing_fields = [field for field, value in zip(_ESSENTIAL_FIELDS, essential_values) if not value]
         st.warning(f"⚠️ Please complete the following essential fields before export: {', '.join(missing_fields)}")
     else:
         if st.button("📊 Export Patient Data", type="primary"):
-            # Get sample data
-            sample_df = generate_sample_data()
-            
-            # Create current patient DataFrame
-            current_patient_df = create_export_dataframe()
-            
-            # Ensure columns match between current patient and sample data
-            # Get common columns that exist in both datasets
-            current_columns = set(current_patient_df.columns)
-            sample_columns = set(sample_df.columns)
-            common_columns = list(current_columns & sample_columns)
-            
-            # Add missing columns to sample data to match current patient structure
-            for col in current_columns:
-                if col not in sample_df.columns:
-                    if col in ['Verification_Notes', 'Data_Verified']:
-                        sample_df[col] = ['' if col == 'Verification_Notes' else False] * len(sample_df)
-                    else:
-                        sample_df[col] = [''] * len(sample_df)
-            
-            # Add missing columns to current patient data to match sample structure
-            for col in sample_columns:
-                if col not in current_patient_df.columns:
-                    current_patient_df[col] = ['']
-            
-            # Align column order - use current patient column order as primary
-            final_columns = list(current_patient_df.columns)
-            
-            # Reorder both DataFrames to have same column order
-            current_patient_aligned = current_patient_df[final_columns]
-            sample_df_aligned = sample_df[final_columns]
-            
-            # Combine the datasets - current patient first, then sample data
-            combined_df = pd.concat([current_patient_aligned, sample_df_aligned], ignore_index=True)
-            
-            # Display preview
-            st.subheader(f"📋 Combined Dataset Export Preview ({len(combined_df)} Patients)")
-            st.write(f"**Includes:** Current patient + {len(sample_df)} sample patients")
-            st.dataframe(combined_df, use_container_width=True)
+            # Build (or reuse cached) combined CSV and preview for the current record
+            record_items = tuple(create_export_record(st.session_state.now).items())
+            csv_data, patient_count = build_export_csv(record_items)
             
-            # Generate CSV for download
-            csv_data = combined_df.to_csv(index=False)
+            # Display preview - the current patient's record is shown as-is, without
+            # materialising a DataFrame just for display
+            st.subheader("📋 Current Patient Record Preview")
+            st.write(f"**Includes:** Current patient + {patient_count - 1} sample patients ({patient_count} patients in the combined export)")
+            st.json({column: _preview_value(value) for column, value in record_items})
             
             # Create filename
             participant_id = data['Participant_ID'] if data['Participant_ID'] else 'UNKNOWN'
-            filename = f"tb_study_combined_data_{participant_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+            filename = f"tb_study_combined_data_{participant_id}_{st.session_state.now.strftime('%Y%m%d_%H%M%S')}.csv"
             
             st.download_button(
                 label="💾 Download Combined Dataset (CSV)",
@@ -1125,151 +1234,229 @@ def section_verification():
                 help="Download current patient data combined with sample patients"
             )
             
-            st.success(f"✅ Combined dataset ready with {len(combined_df)} patients!")
+            # Compressed copy for slow connections (the categorical columns repeat heavily)
+            st.download_button(
+                label="🗜️ Download Compressed (CSV.GZ)",
+                data=gzip.compress(csv_data, mtime=0),
+                file_name=f"{filename}.gz",
+                mime="application/gzip",
+                help="Same combined dataset, gzip-compressed for faster transfer"
+            )
+            
+            st.success(f"✅ Combined dataset ready with {patient_count} patients!")
+
+@lru_cache(maxsize=256)
+def _join_values(values):
+    """Join a tuple of multi-select values into a single export cell (memoised)."""
+    return '; '.join(values)
 
-def create_export_dataframe():
-    """Create a comprehensive DataFrame for data export."""
+def _join_list_field(data, key):
+    """Join a multi-select (list) field into a single export cell (missing/None -> '')."""
+    return _join_values(tuple(data.get(key) or ()))
+
+def _join_field(key):
+    """Return an extractor that joins the given list field for export."""
+    return partial(_join_list_field, key=key)
+
+# Export schema: (column name, extractor) pairs in CSV column order, following the
+# core identifiers that create_export_record() puts first
+_EXPORT_FIELDS = (
+    # Demographics
+    ('Age', itemgetter('Age')),
+    ('Gender', itemgetter('Gender')),
+    ('Address', itemgetter('Address')),
+    ('Occupation', itemgetter('Occupation')),
+    ('Education', itemgetter('Education')),
+    ('Monthly_Income', itemgetter('Monthly_Income')),
+    ('Marital_Status', itemgetter('Marital_Status')),
+    ('Residence_Type', itemgetter('Residence_Type')),
+    ('Comorbidities', itemgetter('Comorbidities')),
+    ('Comorbidities_Details', itemgetter('Comorbidities_Details')),
+    ('TB_Type', itemgetter('TB_Type')),
+    ('Addictive_Substances', itemgetter('Addictive_Substances')),
+    ('Addictive_Substances_Details', itemgetter('Addictive_Substances_Details')),
+    
+    # Critical dates
+    ('Date_Symptom_Onset', itemgetter('Date_Symptom_Onset')),
+    ('Date_First_Visit', itemgetter('Date_First_Visit')),
+    ('Date_Diagnosis', itemgetter('Date_Diagnosis')),
+    ('Date_Treatment_Start', itemgetter('Date_Treatment_Start')),
+    
+    # Calculated delays
+    ('Patient_Delay', itemgetter('Patient_Delay')),
+    ('Healthcare_Provider_Related_Delay', itemgetter('Healthcare_Provider_Related_Delay')),
+    ('Treatment_Delay', itemgetter('Treatment_Delay')),
+    ('Total_Delay', itemgetter('Total_Delay')),
+    ('TB_Unit_TU', itemgetter('TB_Unit_TU')),
+    ('Healthcare_Providers', itemgetter('Healthcare_Providers')),
+    ('No_Delay', itemgetter('No_Delay')),
+    
+    # Specific delay reasons for each gap
+    ('Patient_Delay_Specific_Reason', itemgetter('Patient_Delay_Specific_Reason')),
+    ('Provider_Delay_Specific_Reason', itemgetter('Provider_Delay_Specific_Reason')),
+    ('Treatment_Delay_Specific_Reason', itemgetter('Treatment_Delay_Specific_Reason')),
+    
+    # Questionnaire responses
+    ('Symptoms_Nature', _join_field('Symptoms_Nature')),
+    ('First_Care_Location', itemgetter('First_Care_Location')),
+    ('Patient_Delay_Reason', _join_field('Patient_Delay_Reason')),
+    ('Healthcare_Visits_Count', itemgetter('Healthcare_Visits_Count')),
+    ('Diagnostic_Tests', _join_field('Diagnostic_Tests')),
+    ('Treatment_Delay_Experienced', itemgetter('Treatment_Delay_Experienced')),
+    ('Treatment_Delay_Reason', _join_field('Treatment_Delay_Reason')),
+    ('Provider_Awareness', itemgetter('Provider_Awareness')),
+    ('Provider_Explanation', itemgetter('Provider_Explanation')),
+    ('Provider_Difficulties', itemgetter('Provider_Difficulties')),
+    ('Provider_Difficulties_Details', _join_field('Provider_Difficulties_Details')),
+    ('Treatment_Satisfaction', itemgetter('Treatment_Satisfaction')),
+    ('TB_Stigma', itemgetter('TB_Stigma')),
+    ('Family_History', itemgetter('Family_History')),
+    ('Family_History_Year', itemgetter('Family_History_Year')),
+    ('Additional_Support_Needed', _join_field('Additional_Support_Needed')),
+    
+    # DHLI scores (individual questions)
+    *((q_key, itemgetter(q_key)) for q_key in _DHLI_KEYS),
+    ('DHLI_Total_Score', itemgetter('DHLI_Total_Score')),
+    
+    # Verification
+    ('Data_Verified', itemgetter('Data_Verified')),
+    ('Verification_Notes', itemgetter('Verification_Notes'))
+)
+
+def create_export_record(collection_date):
+    """Create an ordered export record (column -> value) for the current participant."""
     data = st.session_state.participant_data
-    
-    # Create export dictionary with all required columns
-    export_dict = {
+    return {
         # Core identifiers
-        'Participant_ID': [data['Participant_ID']],
-        'Name_Initials': [data['Name_Initials']],
-        'Data_Collection_Date': [datetime.now().strftime('%Y-%m-%d')],
-        
-        # Demographics
-        'Age': [data['Age']],
-        'Gender': [data['Gender']],
-        'Address': [data['Address']],
-        'Occupation': [data['Occupation']],
-        'Education': [data['Education']],
-        'Monthly_Income': [data['Monthly_Income']],
-        'Marital_Status': [data['Marital_Status']],
-        'Residence_Type': [data['Residence_Type']],
-        'Comorbidities': [data['Comorbidities']],
-        'Comorbidities_Details': [data['Comorbidities_Details']],
-        'TB_Type': [data['TB_Type']],
-        'Addictive_Substances': [data['Addictive_Substances']],
-        'Addictive_Substances_Details': [data['Addictive_Substances_Details']],
-        
-        # Critical dates
-        'Date_Symptom_Onset': [data['Date_Symptom_Onset']],
-        'Date_First_Visit': [data['Date_First_Visit']],
-        'Date_Diagnosis': [data['Date_Diagnosis']],
-        'Date_Treatment_Start': [data['Date_Treatment_Start']],
-        
-        # Calculated delays
-        'Patient_Delay': [data['Patient_Delay']],
-        'Healthcare_Provider_Related_Delay': [data['Healthcare_Provider_Related_Delay']],
-        'Treatment_Delay': [data['Treatment_Delay']],
-        'Total_Delay': [data['Total_Delay']],
-        'TB_Unit_TU': [data['TB_Unit_TU']],
-        'Healthcare_Providers': [data['Healthcare_Providers']],
-        'No_Delay': [data['No_Delay']],
-        
-        # Specific delay reasons for each gap
-        'Patient_Delay_Specific_Reason': [data['Patient_Delay_Specific_Reason']],
-        'Provider_Delay_Specific_Reason': [data['Provider_Delay_Specific_Reason']],
-        'Treatment_Delay_Specific_Reason': [data['Treatment_Delay_Specific_Reason']],
-        
-        # Questionnaire responses
-        'Symptoms_Nature': ['; '.join(data['Symptoms_Nature'])],
-        'First_Care_Location': [data['First_Care_Location']],
-        'Patient_Delay_Reason': ['; '.join(data['Patient_Delay_Reason'])],
-        'Healthcare_Visits_Count': [data['Healthcare_Visits_Count']],
-        'Diagnostic_Tests': ['; '.join(data['Diagnostic_Tests'])],
-        'Treatment_Delay_Experienced': [data['Treatment_Delay_Experienced']],
-        'Treatment_Delay_Reason': ['; '.join(data['Treatment_Delay_Reason'])],
-        'Provider_Awareness': [data['Provider_Awareness']],
-        'Provider_Explanation': [data['Provider_Explanation']],
-        'Provider_Difficulties': [data['Provider_Difficulties']],
-        'Provider_Difficulties_Details': ['; '.join(data['Provider_Difficulties_Details'])],
-        'Treatment_Satisfaction': [data['Treatment_Satisfaction']],
-        'TB_Stigma': [data['TB_Stigma']],
-        'Family_History': [data['Family_History']],
-        'Family_History_Year': [data['Family_History_Year']],
-        'Additional_Support_Needed': ['; '.join(data['Additional_Support_Needed'])],
-        
-        # DHLI scores (individual questions)
-        'DHLI_Q1': [data['DHLI_Q1']],
-        'DHLI_Q2': [data['DHLI_Q2']],
-        'DHLI_Q3': [data['DHLI_Q3']],
-        'DHLI_Q4': [data['DHLI_Q4']],
-        'DHLI_Q5': [data['DHLI_Q5']],
-        'DHLI_Q6': [data['DHLI_Q6']],
-        'DHLI_Q7': [data['DHLI_Q7']],
-        'DHLI_Q8': [data['DHLI_Q8']],
-        'DHLI_Q9': [data['DHLI_Q9']],
-        'DHLI_Q10': [data['DHLI_Q10']],
-        'DHLI_Total_Score': [data['DHLI_Total_Score']],
-        
-        # Verification
-        'Data_Verified': [data['Data_Verified']],
-        'Verification_Notes': [data['Verification_Notes']]
+        'Participant_ID': data['Participant_ID'],
+        'Name_Initials': data['Name_Initials'],
+        'Data_Collection_Date': collection_date.strftime('%Y-%m-%d'),
+        **{column: extract(data) for column, extract in _EXPORT_FIELDS}
     }
+
+def _preview_value(value):
+    """Return a JSON-friendly form of an export value (dates become ISO strings)."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+def _export_rows(columns, current_row, sample_df):
+    """Yield CSV rows: header, current participant, then each sample patient."""
+    yield columns
+    yield current_row
+    yield from sample_df.itertuples(index=False, name=None)
+
+def create_export_csv(columns, current_row, sample_df):
+    """Write the current participant followed by the sample patients as UTF-8 CSV bytes."""
+    buffer = io.BytesIO()
+    text = io.TextIOWrapper(buffer, encoding='utf-8', newline='')
+    writer = csv.writer(text, lineterminator="\n")
+    writer.writerows(_export_rows(columns, current_row, sample_df))
+    
+    # Flush and detach so the byte buffer stays open after the wrapper goes away
+    text.flush()
+    text.detach()
+    return buffer.getvalue()
+
+# Cached on the record's (column, value) items, so re-exporting unchanged data
+# reuses the CSV bytes; bounded, as every distinct record adds an entry
+@st.cache_data(max_entries=32)
+def build_export_csv(record_items):
+    """Combine the current participant record with sample data; return (CSV bytes, patient count)."""
+    export_record = dict(record_items)
+    
+    # Get sample data stamped with the same collection date as the current record
+    sample_df = generate_sample_data(export_record['Data_Collection_Date'])
+    
+    # Align column order - current patient columns first, then any sample-only columns
+    final_columns = list(export_record) + [col for col in sample_df.columns if col not in export_record]
+    current_row = [export_record.get(col, '') for col in final_columns]
+    
+    # Add missing columns to sample data in one reindex; sample rows are unverified.
+    # When the schemas already match (the normal case) the cached frame is used as-is.
+    if sample_df.columns.equals(pd.Index(final_columns)):
+        sample_df_aligned = sample_df
+    else:
+        if 'Data_Verified' not in sample_df.columns:
+            sample_df = sample_df.assign(Data_Verified=False)
+        sample_df_aligned = sample_df.reindex(columns=final_columns, fill_value='')
+    
+    # Generate CSV for download - current patient first, then sample data
+    csv_data = create_export_csv(final_columns, current_row, sample_df_aligned)
     
-    return pd.DataFrame(export_dict)
+    return csv_data, len(sample_df_aligned) + 1
+
+# Application sections in navigation order: (title, render function)
+_SECTIONS = (
+    ("📋 Demographics & Clinical Info", section_demographics),
+    ("📅 Digital Pathway Mapping", section_digital_pathway),
+    ("📱 DHLI Assessment", section_dhli),
+    ("� Data Visualization", section_visualization),
+    ("✅ Verification & Export", section_verification)
+)
+
+_get_progress_fields = itemgetter(
+    'Participant_ID', 'Date_Symptom_Onset', 'Total_Delay', 'DHLI_Total_Score', 'Data_Verified'
+)
+
+def _progress_items(data):
+    """Return (label, completed) pairs for the sidebar progress checklist."""
+    participant_id, symptom_date, total_delay, dhli_score, verified = _get_progress_fields(data)
+    return (
+        ("Demographics", bool(participant_id)),
+        ("Dates", bool(symptom_date)),
+        ("Delays", total_delay > 0),
+        ("DHLI", dhli_score > 0),
+        ("Verified", verified)
+    )
 
 def main():
     """Main application function."""
     # Initialize session state
     initialize_session_state()
     
+    # Single timestamp shared by export dates, filenames and the footer for this rerun
+    st.session_state.now = datetime.now()
+    
     # Application header
     st.title("🏥 TB Study Data Collection Application")
     st.markdown("### Cross-sectional TB Study - Chennai")
     st.markdown("**Digital pathway mapping and eHealth literacy assessment platform**")
     
-    # Define sections
-    sections = [
-        ("📋 Demographics & Clinical Info", section_demographics),
-        ("📅 Digital Pathway Mapping", section_digital_pathway),
-        ("📱 DHLI Assessment", section_dhli),
-        ("� Data Visualization", section_visualization),
-        ("✅ Verification & Export", section_verification)
-    ]
-    
     # Current section indicator
-    current_section_name = sections[st.session_state.current_section][0]
-    st.write(f"**Section {st.session_state.current_section + 1}/{len(sections)}:** {current_section_name}")
+    current_section_name = _SECTIONS[st.session_state.current_section][0]
+    st.write(f"**Section {st.session_state.current_section + 1}/{len(_SECTIONS)}:** {current_section_name}")
     
     st.markdown("---")
     
-    # Sidebar info
-    st.sidebar.title("📋 Study Information")
-    st.sidebar.markdown("**Cross-sectional TB Study**")
-    st.sidebar.markdown("Chennai, Tamil Nadu")
-    st.sidebar.markdown("---")
+    # Sidebar info - built as one markdown block; the Reset button is the only other sidebar element
+    data = st.session_state.participant_data
+    sidebar_blocks = [
+        "# 📋 Study Information",
+        "**Cross-sectional TB Study**",
+        "Chennai, Tamil Nadu",
+        "---"
+    ]
     
     # Display participant info in sidebar if available
-    if st.session_state.participant_data['Participant_ID']:
-        st.sidebar.markdown("---")
-        st.sidebar.markdown("**Current Participant:**")
-        st.sidebar.markdown(f"ID: `{st.session_state.participant_data['Participant_ID']}`")
-        if st.session_state.participant_data['Age'] > 0:
-            st.sidebar.markdown(f"Age: {st.session_state.participant_data['Age']}")
-        if st.session_state.participant_data['TB_Type']:
-            st.sidebar.markdown(f"TB Type: {st.session_state.participant_data['TB_Type']}")
+    if data['Participant_ID']:
+        sidebar_blocks += ["---", "**Current Participant:**", f"ID: `{data['Participant_ID']}`"]
+        if data['Age'] > 0:
+            sidebar_blocks.append(f"Age: {data['Age']}")
+        if data['TB_Type']:
+            sidebar_blocks.append(f"TB Type: {data['TB_Type']}")
     
     # Progress indicator
-    st.sidebar.markdown("---")
-    st.sidebar.markdown("**Progress:**")
-    
-    progress_items = [
-        ("Demographics", bool(st.session_state.participant_data['Participant_ID'])),
-        ("Dates", bool(st.session_state.participant_data['Date_Symptom_Onset'])),
-        ("Delays", st.session_state.participant_data['Total_Delay'] > 0),
-        ("DHLI", st.session_state.participant_data['DHLI_Total_Score'] > 0),
-        ("Verified", st.session_state.participant_data['Data_Verified'])
-    ]
+    sidebar_blocks += ["---", "**Progress:**"]
+    sidebar_blocks.extend(
+        f"{'✅' if completed else '⏳'} {item}" for item, completed in _progress_items(data)
+    )
+    sidebar_blocks.append("---")
     
-    for item, completed in progress_items:
-        status = "✅" if completed else "⏳"
-        st.sidebar.markdown(f"{status} {item}")
+    st.sidebar.markdown("\n\n".join(sidebar_blocks))
     
     # Display current section
-    current_section_func = sections[st.session_state.current_section][1]
+    current_section_func = _SECTIONS[st.session_state.current_section][1]
     current_section_func()
     
     # Navigation buttons at bottom
@@ -1282,19 +1469,18 @@ def main():
             st.rerun()
     
     with col_nav2:
-        if st.button("➡️ Next", disabled=(st.session_state.current_section == len(sections) - 1)):
-            st.session_state.current_section = min(len(sections) - 1, st.session_state.current_section + 1)
+        if st.button("➡️ Next", disabled=(st.session_state.current_section == len(_SECTIONS) - 1)):
+            st.session_state.current_section = min(len(_SECTIONS) - 1, st.session_state.current_section + 1)
             st.rerun()
     
     # Footer
     st.markdown("---")
     st.markdown(
         "**TB Study Data Collection App** | Developed for Cross-sectional TB Study, Chennai | "
-        f"Session: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        f"Session: {st.session_state.now.strftime('%Y-%m-%d %H:%M:%S')}"
     )
     
     # Reset button in sidebar
-    st.sidebar.markdown("---")
     if st.sidebar.button("🔄 Reset Session", help="Clear all data and start fresh"):
         for key in list(st.session_state.keys()):
             del st.session_state[key]